@@ -1,9 +1,9 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 import datetime
 import math
 import os
-import matplotlib.pyplot as plt
 
 # ==== CONFIG & PATHS ====
 BACKLOG_CSV = "backlog.csv"
@@ -17,107 +17,140 @@ def ensure_files():
     if not os.path.exists(HISTORY_CSV):
         pd.DataFrame(columns=["Date","Total Backlog"])\
           .to_csv(HISTORY_CSV, index=False)
+        # Don't chart the old file's cached rows
+        st.cache_data.clear()
 
 ensure_files()
 
 # ==== LOAD / SAVE ====
 def load_backlog():
-    df = pd.read_csv(BACKLOG_CSV)
+    # Cast lecture counts once here; any extra columns are kept for the save
+    df = pd.read_csv(BACKLOG_CSV,
+                     dtype={"Subject": str, "Number of Lectures": int, "Last Updated": str})
+    # Keep dates as datetime64 in memory; they are only formatted on save
+    df["Last Updated"] = pd.to_datetime(df["Last Updated"], format="%Y-%m-%d", cache=True)
     return df
 
 def save_backlog(df):
-    df.to_csv(BACKLOG_CSV, index=False)
-
+    df.to_csv(BACKLOG_CSV, index=False, date_format="%Y-%m-%d")
+
+def append_history(rows):
+    # A hand-edited file may lack a final newline; add one so rows don't merge
+    with open(HISTORY_CSV, "rb+") as f:
+        f.seek(-1, os.SEEK_END)
+        if f.read(1) != b"\n":
+            f.seek(0, os.SEEK_END)
+            f.write(b"\n")
+    rows.to_csv(HISTORY_CSV, mode="a", header=False, index=False)
+
+def read_history():
+    hist = pd.read_csv(HISTORY_CSV, usecols=["Date","Total Backlog"],
+                       dtype={"Date": str, "Total Backlog": int})
+    hist["Date"] = pd.to_datetime(hist["Date"], format="%Y-%m-%d")
+    return hist
+
+# Cached copy for the trend chart only
+@st.cache_data(ttl=300, show_spinner=False)
 def load_history():
-    return pd.read_csv(HISTORY_CSV)
-
-def log_history(total):
-    hist = load_history()
-    today = datetime.date.today().strftime("%Y-%m-%d")
-    if hist.empty or hist["Date"].iloc[-1] != today:
-        hist = pd.concat([hist, pd.DataFrame([[today, total]], columns=hist.columns)], ignore_index=True)
-        hist.to_csv(HISTORY_CSV, index=False)
+    return read_history()
+
+def log_history(total, today):
+    # Already logged today in this session: no need to read history again
+    if st.session_state.get("last_hist_date") == today:
+        return
+    # Check the file itself: a cached copy can miss edits or a recreated file
+    hist = read_history()
+    if hist.empty or hist["Date"].iloc[-1] != pd.Timestamp(today):
+        # Append just today's row instead of rewriting the whole file
+        append_history(pd.DataFrame([[today, total]], columns=hist.columns))
+        load_history.clear()
+    st.session_state.last_hist_date = today
 
 # ==== BUSINESS LOGIC ====
-def auto_increment(df):
-    today = datetime.date.today()
+def auto_increment(df, today):
     # Skip Sundays entirely
     if today.weekday() == 6:
         return df
-    changed = False
-    for i, row in df.iterrows():
-        last = datetime.datetime.strptime(row["Last Updated"], "%Y-%m-%d").date()
-        days_passed = (today - last).days
-        if days_passed > 0:
-            inc = sum(1 for d in range(1, days_passed+1)
-                      if (last + datetime.timedelta(days=d)).weekday() != 6)
-            if inc:
-                df.at[i, "Number of Lectures"] = int(row["Number of Lectures"]) + inc
-                df.at[i, "Last Updated"] = today.strftime("%Y-%m-%d")
-                changed = True
-    if changed:
+    # Count Mon–Sat days in (last, today] for every row in one call;
+    # rows already updated today (or later) come out <= 0
+    last = df["Last Updated"].to_numpy("datetime64[D]")
+    now = np.datetime64(today, "D")
+    inc = np.busday_count(last + 1, now + 1, weekmask="1111110").clip(min=0)
+    changed = inc > 0
+    if changed.any():
+        df["Number of Lectures"] += inc
+        df.loc[changed, "Last Updated"] = pd.Timestamp(today)
         save_backlog(df)
-        log_history(df["Number of Lectures"].sum())
+        log_history(df["Number of Lectures"].sum(), today)
     return df
 
-def mark_done(df, subject, done):
-    today = datetime.date.today()
-    idx = df.index[df["Subject"] == subject][0]
-    curr = int(df.at[idx, "Number of Lectures"])
+def index_subjects(df):
+    # Subject name -> row label, so lookups don't scan the whole column
+    return dict(zip(df["Subject"], df.index))
+
+def mark_done(df, subject_idx, subject, done, today):
+    idx = subject_idx[subject]
+    curr = df.at[idx, "Number of Lectures"]
 
     # 🧠 Updated logic: just subtract exactly how many lectures user says they did
     new_val = max(0, curr - done)
 
     df.at[idx, "Number of Lectures"] = new_val
-    df.at[idx, "Last Updated"] = today.strftime("%Y-%m-%d")
+    df.at[idx, "Last Updated"] = pd.Timestamp(today)
     save_backlog(df)
-    log_history(df["Number of Lectures"].sum())
+    log_history(df["Number of Lectures"].sum(), today)
     return df
 
 def estimate_days(df, pace):
     net_weekly = pace*7 - 6
-    rows = []
-    for _, r in df.iterrows():
-        backlog = int(r["Number of Lectures"])
-        if net_weekly <= 0:
-            days_needed = math.inf
-        else:
-            days_needed = math.ceil(backlog * 7 / net_weekly)
-        rows.append({
-            "Subject": r["Subject"],
-            "Days to Finish": days_needed,
-            "Weeks ~": days_needed // 7
-        })
-    return pd.DataFrame(rows)
+    backlog = df["Number of Lectures"].to_numpy()
+    if net_weekly <= 0:
+        days_needed = np.full(len(backlog), math.inf)
+    else:
+        # Integer ceil(backlog * 7 / net_weekly) for every subject at once
+        days_needed = -(-backlog * 7 // net_weekly)
+    return pd.DataFrame({
+        "Subject": df["Subject"].to_numpy(),
+        "Days to Finish": days_needed,
+        "Weeks ~": days_needed // 7
+    })
 
 # ==== STREAMLIT UI ====
 st.set_page_config(page_title="JEE Backlog Tracker", layout="centered")
 st.title("📚 JEE Backlog Tracker (CSV Only)")
 
-# 1) Load & auto‑increment once
-if "initialized" not in st.session_state:
-    st.session_state.df = auto_increment(load_backlog())
-    st.session_state.initialized = True
+# Resolve the date once per rerun so every step below agrees on it
+today = datetime.date.today()
+
+# 1) Load once per session & auto‑increment once per day
+if "df" not in st.session_state:
+    st.session_state.df = load_backlog()
+    st.session_state.subject_idx = index_subjects(st.session_state.df)
+if st.session_state.get("last_sync_date") != today:
+    st.session_state.df = auto_increment(st.session_state.df, today)
+    st.session_state.last_sync_date = today
 df = st.session_state.df
+subject_idx = st.session_state.subject_idx
 
 # 2) Mark Lectures Done
 st.subheader("✅ Mark Lectures Done")
 if df.empty:
     st.info("No subjects yet. Add one below.")
 else:
-    c1, c2, c3 = st.columns([3,2,2])
-    subj = c1.selectbox("Subject", df["Subject"])
-    done = c2.number_input("Lectures done", min_value=0, step=1)
-    if c3.button("Mark Done"):
-        df = mark_done(df, subj, done)
-        st.session_state.df = df
-        st.success(f"{subj} updated by {done} lectures!")
+    with st.form("done_form"):
+        c1, c2, c3 = st.columns([3,2,2])
+        subj = c1.selectbox("Subject", list(subject_idx))
+        done = c2.number_input("Lectures done", min_value=0, step=1)
+        if c3.form_submit_button("Mark Done"):
+            df = mark_done(df, subject_idx, subj, done, today)
+            st.session_state.df = df
+            st.success(f"{subj} updated by {done} lectures!")
 
 st.markdown("---")
 
 # 3) Force Sync
 if st.button("🔄 Force Sync"):
-    df = auto_increment(df)
+    df = auto_increment(df, today)
     st.session_state.df = df
     st.success("Auto‑increment applied (excluded Sundays)!")
 
@@ -132,54 +165,54 @@ with st.form("add_form"):
         if not new_sub:
             st.warning("Enter a subject name.")
         else:
-            today_str = datetime.date.today().strftime("%Y-%m-%d")
-            if new_sub in df["Subject"].values:
+            if new_sub in subject_idx:
                 # Update existing subject
-                df.loc[df["Subject"] == new_sub, "Number of Lectures"] = new_back
-                df.loc[df["Subject"] == new_sub, "Last Updated"] = today_str
+                df.loc[subject_idx[new_sub], ["Number of Lectures", "Last Updated"]] = [new_back, pd.Timestamp(today)]
                 st.success(f"Updated '{new_sub}' to {new_back} lectures.")
             else:
                 # Add new subject
-                new_row = pd.DataFrame([[new_sub, new_back, today_str]],
-                                       columns=["Subject", "Number of Lectures", "Last Updated"])
-                df = pd.concat([df, new_row], ignore_index=True)
+                df.loc[len(df)] = {"Subject": new_sub, "Number of Lectures": new_back,
+                                   "Last Updated": pd.Timestamp(today)}
+                subject_idx[new_sub] = df.index[-1]
                 st.success(f"Added subject '{new_sub}' with {new_back} lectures.")
 
             save_backlog(df)
-            log_history(df["Number of Lectures"].sum())
+            log_history(df["Number of Lectures"].sum(), today)
             st.session_state.df = df
 
 st.markdown("---")
 
 # 5) Remove Subject
 st.subheader("🗑️ Remove Subject")
-if len(df) == 0:
+if df.empty:
     st.info("No subjects to remove.")
 else:
-    subject_to_remove = st.selectbox("Select Subject to Remove", df["Subject"])
+    subject_to_remove = st.selectbox("Select Subject to Remove", list(subject_idx))
     if st.button("Remove Subject"):
         df = df[df["Subject"] != subject_to_remove].reset_index(drop=True)
+        subject_idx = index_subjects(df)
+        st.session_state.subject_idx = subject_idx
         save_backlog(df)
-        log_history(df["Number of Lectures"].sum())
+        log_history(df["Number of Lectures"].sum(), today)
         st.session_state.df = df
         st.success(f"Removed subject '{subject_to_remove}'.")
         
 # 5) Estimated Time to Clear Backlog
-st.subheader("⏱ Estimated Time to Clear Backlog")
-pace = st.slider("Your daily pace (lectures/day)", 1, 10, 1)
-est_df = estimate_days(df, pace)
-if not est_df.empty:
-    st.table(est_df)
-else:
-    st.info("Add subjects to get an estimate!")
+# Fragment: moving the pace slider reruns only this section, not the whole page
+@st.fragment
+def show_estimate(df):
+    st.subheader("⏱ Estimated Time to Clear Backlog")
+    pace = st.slider("Your daily pace (lectures/day)", 1, 10, 1)
+    est_df = estimate_days(df, pace)
+    if not est_df.empty:
+        st.table(est_df)
+    else:
+        st.info("Add subjects to get an estimate!")
+
+show_estimate(df)
 
 # 6) Backlog Trend Graph
 hist = load_history()
 if not hist.empty:
-    hist["Date"] = pd.to_datetime(hist["Date"])
-    hist["Total Backlog"] = hist["Total Backlog"].astype(int)
     st.subheader("📊 Backlog Over Time")
-    fig, ax = plt.subplots()
-    ax.plot(hist["Date"], hist["Total Backlog"], marker="o", linestyle="-")
-    ax.set_xlabel("Date"); ax.set_ylabel("Total Backlog")
-    st.pyplot(fig)
+    st.line_chart(hist.set_index("Date")["Total Backlog"])